@@ -11,7 +11,12 @@ bl_info = {
     "category": "Object"
 }
 
+import logging
+
 import bpy
+import bmesh
+
+log = logging.getLogger(__name__)
 
 # Utility Functions
 def validate_active_object(context, required_type='MESH', require_vertex_groups=False):
@@ -38,13 +43,21 @@ def validate_selection(context, min_objects=2, require_active_in_selection=True,
             return "Active object must be among the selected objects."
     return None
 
+def find_armature_modifier(obj):
+    # Returns the first armature modifier (or None) and whether there is more than one,
+    # stops scanning after the second match
+    armature_modifiers = (mod for mod in obj.modifiers if mod.type == 'ARMATURE')
+    armature_modifier = next(armature_modifiers, None)
+    has_multiple = next(armature_modifiers, None) is not None
+    return armature_modifier, has_multiple
+
 def validate_armature_modifier(obj, require_armature=None):
-    armature_modifiers = [mod for mod in obj.modifiers if mod.type == 'ARMATURE']
-    if len(armature_modifiers) != 1:
+    armature_modifier, has_multiple = find_armature_modifier(obj)
+    if armature_modifier is None or has_multiple:
         return "Object must have exactly one armature modifier."
-    if armature_modifiers[0].object is None:
+    if armature_modifier.object is None:
         return "Armature modifier has no object assigned."
-    if require_armature and armature_modifiers[0].object != require_armature:
+    if require_armature and armature_modifier.object != require_armature:
         return "Armature modifier does not point to the required armature."
     return None
 
@@ -59,65 +72,64 @@ def validate_armature_parent_and_modifier(obj):
         return message
     return None
 
-def ensure_single_armature_modifier(obj, armature):
-    armature_modifiers = [mod for mod in obj.modifiers if mod.type == 'ARMATURE']
-    if len(armature_modifiers) == 0:
+def ensure_single_armature_modifier(obj, armature, armature_modifier):
+    # armature_modifier is the object's only armature modifier as found by find_armature_modifier, or None
+    if armature_modifier is None:
         new_modifier = obj.modifiers.new(name="Armature", type='ARMATURE')
         new_modifier.object = armature
-        print(f"Created a new armature modifier for '{obj.name}'.")
-        return True
-    elif len(armature_modifiers) == 1:
-        armature_modifiers[0].object = armature
-        print(f"Updated existing armature modifier for '{obj.name}'.")
-        return True
-    else:
-        return False
+        log.debug("Created a new armature modifier for '%s'.", obj.name)
+        return
+    armature_modifier.object = armature
+    log.debug("Updated existing armature modifier for '%s'.", obj.name)
 
 def get_used_vertex_groups(obj):
-    weighted_groups = set()
-    for vertex in obj.data.vertices:
-        for vg in vertex.groups:
-            if vg.weight > 0:
-                weighted_groups.add(vg.group)
-    return weighted_groups
+    # Read weights from a BMesh copy of the mesh through its deform layer instead of vertex.groups
+    bm = bmesh.new()
+    try:
+        bm.from_mesh(obj.data)
+        deform_layer = bm.verts.layers.deform.active
+        if deform_layer is None:
+            return set()
+        return {
+            group for vertex in bm.verts for group, weight in vertex[deform_layer].items() if weight > 0
+        }
+    finally:
+        bm.free()
 
 def delete_zero_weight_vertex_groups(obj):
     weighted_groups = get_used_vertex_groups(obj)
-    vertex_groups_to_remove = [
-        vg.index for vg in obj.vertex_groups if vg.index not in weighted_groups
-    ]
     removed_groups = []
-    for index in sorted(vertex_groups_to_remove, reverse=True):
-        removed_groups.append(obj.vertex_groups[index].name)
-        obj.vertex_groups.remove(obj.vertex_groups[index])
+    # Vertex group indices match their position, walk backwards so removals don't shift pending indices
+    for index in range(len(obj.vertex_groups) - 1, -1, -1):
+        if index not in weighted_groups:
+            vg = obj.vertex_groups[index]
+            removed_groups.append(vg.name)
+            obj.vertex_groups.remove(vg)
     return removed_groups
 
 def add_parent_bones(armature, used_bone_names):
-    bpy.ops.object.mode_set(mode='EDIT')
-    existing_bone_names = set(used_bone_names)
-    for bone in armature.data.edit_bones:
-        if bone.name in existing_bone_names:
-            while bone:
+    # Bone hierarchy is also available outside of edit mode, so no mode switch is needed here
+    for bone in armature.data.bones:
+        if bone.name in used_bone_names:
+            bone = bone.parent
+            while bone and bone.name not in used_bone_names:
                 used_bone_names.add(bone.name)
                 bone = bone.parent
-    bpy.ops.object.mode_set(mode='OBJECT')
-
-def delete_unused_bones(armature, used_bone_names):
-    bpy.ops.object.mode_set(mode='EDIT')
-    bones_to_delete = []
-    for bone in armature.data.edit_bones:
-        if bone.name not in used_bone_names:
-            bones_to_delete.append(bone.name)
-    num_bones_deleted = len(bones_to_delete)
-    for bone_name in bones_to_delete:
-        bone = armature.data.edit_bones.get(bone_name)
-        if bone:
-            armature.data.edit_bones.remove(bone)
-    bpy.ops.object.mode_set(mode='OBJECT')
-    return num_bones_deleted
-
-def valid_interaction_mode():
-    current_mode = bpy.context.mode
+
+def delete_unused_bones(context, armature, used_bone_names):
+    with context.temp_override(active_object=armature, object=armature):
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = armature.data.edit_bones
+        # Keep references from this single pass, edit_bones[name] is a linear search so looking
+        # bones up again by name (e.g. after a set difference on names) would be O(deleted x bones)
+        bones_to_delete = [bone for bone in edit_bones if bone.name not in used_bone_names]
+        for bone in bones_to_delete:
+            edit_bones.remove(bone)
+        bpy.ops.object.mode_set(mode='OBJECT')
+    return len(bones_to_delete)
+
+def valid_interaction_mode(context):
+    current_mode = context.mode
     if current_mode != 'OBJECT':
         return f"This function only works in object mode! Current mode is: '{current_mode}' "
     else:
@@ -131,7 +143,8 @@ class OBJECT_OT_transfer_vertex_groups_from_active(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        message = validate_selection(context, min_objects=2)
+        # Cheapest checks first, poll runs on every redraw
+        message = valid_interaction_mode(context)
         if message:
             cls.poll_message_set(message)
             return False
@@ -139,13 +152,12 @@ class OBJECT_OT_transfer_vertex_groups_from_active(bpy.types.Operator):
         if message:
             cls.poll_message_set(message)
             return False
-        active_object = context.active_object
-        message = validate_armature_parent_and_modifier(active_object)
+        message = validate_selection(context, min_objects=2)
         if message:
             cls.poll_message_set(message)
             return False
-        
-        message = valid_interaction_mode()
+        active_object = context.active_object
+        message = validate_armature_parent_and_modifier(active_object)
         if message:
             cls.poll_message_set(message)
             return False
@@ -154,47 +166,56 @@ class OBJECT_OT_transfer_vertex_groups_from_active(bpy.types.Operator):
 
     def execute(self, context):
         active_object = context.active_object
-        # Get the armature that the active obj uses so the targets can be paranted to it
-        active_object_arm_mod = next(m for m in active_object.modifiers if m.type == 'ARMATURE')
-        if active_object_arm_mod and active_object_arm_mod.object:
-            active_object_armature = active_object_arm_mod.object
+        # Get the armature that the active obj uses so the targets can be paranted to it,
+        # poll guarantees the active obj is parented to the same armature its modifier points to
+        active_object_armature = active_object.parent
 
         selected_objects = context.selected_objects
         targets = [obj for obj in selected_objects if obj != active_object and obj.type == 'MESH']
 
+        # The parent doesn't change between targets, so only invert its matrix once
+        inv_parent_world = active_object_armature.matrix_world.inverted()
+
+        # Check all targets before changing any of them so a bad target doesn't leave a half-done transfer
+        target_armature_modifiers = []
         for target in targets:
-            # Ensure single armature modifier on each target
-            success = ensure_single_armature_modifier(target, active_object.parent)
-            if not success:
+            armature_modifier, has_multiple = find_armature_modifier(target)
+            if has_multiple:
                 self.report({'ERROR'}, f"'{target.name}' has multiple armature modifiers. Only one is allowed.")
                 return {'CANCELLED'}
+            target_armature_modifiers.append(armature_modifier)
+
+        for target, armature_modifier in zip(targets, target_armature_modifiers):
+            # Ensure single armature modifier on each target, reusing the modifier found above
+            ensure_single_armature_modifier(target, active_object_armature, armature_modifier)
 
             # Set parent for each target 
             target.parent = active_object_armature
-            target.matrix_parent_inverse = active_object.parent.matrix_world.inverted()
-
-            # Transfer vertex groups to each target
-            bpy.ops.object.select_all(action='DESELECT')
-            active_object.select_set(True)
-            target.select_set(True)
-            context.view_layer.objects.active = active_object
-
-            bpy.ops.object.data_transfer(
-                data_type='VGROUP_WEIGHTS',
-                use_auto_transform=False,
-                use_object_transform=True,
-                layers_select_src='ALL',
-                layers_select_dst='NAME'
-            )
+            target.matrix_parent_inverse = inv_parent_world.copy()
+
+        # Transfer vertex groups to all targets at once, data_transfer already applies to every selected object
+        if targets:
+            with context.temp_override(
+                object=active_object,
+                active_object=active_object,
+                selected_objects=[active_object, *targets],
+                selected_editable_objects=[active_object, *targets]
+            ):
+                bpy.ops.object.data_transfer(
+                    data_type='VGROUP_WEIGHTS',
+                    use_auto_transform=False,
+                    use_object_transform=True,
+                    layers_select_src='ALL',
+                    layers_select_dst='NAME'
+                )
         
         self.report({'INFO'}, f"Vertex groups transferred from '{active_object.name}' to {len(targets)} objects")
         
-        # Deselect all to avoid wierd selection state from previsouse operations
-        bpy.ops.object.select_all(action='DESELECT')
-
-        # Reselect the objects in the list
-        for obj in targets:
-            obj.select_set(True)
+        # Leave only the targets selected, the transfer ran under a context override so the
+        # selection is still the original one and the targets are already part of it
+        for obj in selected_objects:
+            if obj == active_object or obj.type != 'MESH':
+                obj.select_set(False)
 
         return {'FINISHED'}
 
@@ -206,17 +227,17 @@ class OBJECT_OT_delete_unused_vertex_groups(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        message = validate_active_object(context, required_type='MESH', require_vertex_groups=True)
+        # Cheapest checks first, poll runs on every redraw
+        message = valid_interaction_mode(context)
         if message:
             cls.poll_message_set(message)
             return False
-        active_object = context.active_object
-        message = validate_armature_modifier(active_object)
+        message = validate_active_object(context, required_type='MESH', require_vertex_groups=True)
         if message:
             cls.poll_message_set(message)
             return False
-        
-        message = valid_interaction_mode()
+        active_object = context.active_object
+        message = validate_armature_modifier(active_object)
         if message:
             cls.poll_message_set(message)
             return False
@@ -225,7 +246,7 @@ class OBJECT_OT_delete_unused_vertex_groups(bpy.types.Operator):
 
     def execute(self, context):
         # Filter to only mesh objects
-        current_selection = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
+        current_selection = [obj for obj in context.selected_objects if obj.type == 'MESH']
         removed_groups = []
 
         # Process each mesh object
@@ -267,22 +288,22 @@ class OBJECT_OT_confirm_delete_unused_bones(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        message = validate_selection(context, min_objects=1,require_active_in_selection=True,max_objects=1)
+        # Cheapest checks first, poll runs on every redraw
+        message = valid_interaction_mode(context)
         if message:
             cls.poll_message_set(message)
             return False
-
         message = validate_active_object(context, required_type='MESH', require_vertex_groups=True)
         if message:
             cls.poll_message_set(message)
             return False
-        active_object = context.active_object
-        message = validate_armature_parent_and_modifier(active_object)
+        message = validate_selection(context, min_objects=1,require_active_in_selection=True,max_objects=1)
         if message:
             cls.poll_message_set(message)
             return False
-        
-        message = valid_interaction_mode()
+
+        active_object = context.active_object
+        message = validate_armature_parent_and_modifier(active_object)
         if message:
             cls.poll_message_set(message)
             return False
@@ -290,8 +311,6 @@ class OBJECT_OT_confirm_delete_unused_bones(bpy.types.Operator):
         return True
 
     def invoke(self, context, event):
-        if not self.poll(context):
-            return {'CANCELLED'}
         return context.window_manager.invoke_props_dialog(self)
 
     def draw(self, context):
@@ -311,15 +330,18 @@ class OBJECT_OT_confirm_delete_unused_bones(bpy.types.Operator):
             self.report({'ERROR'}, message)
             return {'CANCELLED'}
 
-        armature.hide_viewport = False
-        armature.hide_set(False)
+        # Only write visibility when it actually changes to avoid needless depsgraph updates
+        if armature.hide_viewport:
+            armature.hide_viewport = False
+        if armature.hide_get():
+            armature.hide_set(False)
 
         if self.duplicate_armature:
-            bpy.ops.object.select_all(action='DESELECT')
-            armature.select_set(True)
-            context.view_layer.objects.active = armature
-            bpy.ops.object.duplicate()
-            duplicated_armature = context.active_object
+            # Copy through the data API instead of bpy.ops.object.duplicate to skip the operator overhead
+            duplicated_armature = armature.copy()
+            duplicated_armature.data = armature.data.copy()
+            for collection in armature.users_collection:
+                collection.objects.link(duplicated_armature)
             duplicated_armature.parent = None
 
             obj.parent = duplicated_armature
@@ -330,7 +352,7 @@ class OBJECT_OT_confirm_delete_unused_bones(bpy.types.Operator):
 
             armature = duplicated_armature
 
-        used_bone_names = set([vg.name for vg in obj.vertex_groups])
+        used_bone_names = {vg.name for vg in obj.vertex_groups}
 
         bpy.ops.object.select_all(action='DESELECT')
         armature.select_set(True)
@@ -339,7 +361,7 @@ class OBJECT_OT_confirm_delete_unused_bones(bpy.types.Operator):
         if not self.delete_empty_parent_bones:
             add_parent_bones(armature, used_bone_names)
 
-        num_bones_deleted = delete_unused_bones(armature, used_bone_names)
+        num_bones_deleted = delete_unused_bones(context, armature, frozenset(used_bone_names))
 
         self.report({'INFO'}, f"Deleted {num_bones_deleted} unused bones.")
 
@@ -371,19 +393,22 @@ def draw_vertex_group_menu(self, context):
     layout.menu(OBJECT_MT_vertex_tools.bl_idname, icon='MODIFIER')
 
 # Registration
+classes = (
+    OBJECT_OT_transfer_vertex_groups_from_active,
+    OBJECT_OT_delete_unused_vertex_groups,
+    OBJECT_OT_confirm_delete_unused_bones,
+    OBJECT_MT_vertex_tools,
+)
+
 def register():
-    bpy.utils.register_class(OBJECT_OT_transfer_vertex_groups_from_active)
-    bpy.utils.register_class(OBJECT_OT_delete_unused_vertex_groups)
-    bpy.utils.register_class(OBJECT_OT_confirm_delete_unused_bones)
-    bpy.utils.register_class(OBJECT_MT_vertex_tools)
+    for cls in classes:
+        bpy.utils.register_class(cls)
     bpy.types.MESH_MT_vertex_group_context_menu.append(draw_vertex_group_menu)
 
 def unregister():
-    bpy.utils.unregister_class(OBJECT_OT_transfer_vertex_groups_from_active)
-    bpy.utils.unregister_class(OBJECT_OT_delete_unused_vertex_groups)
-    bpy.utils.unregister_class(OBJECT_OT_confirm_delete_unused_bones)
-    bpy.utils.unregister_class(OBJECT_MT_vertex_tools)
     bpy.types.MESH_MT_vertex_group_context_menu.remove(draw_vertex_group_menu)
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
 
 if __name__ == "__main__":
     register()
\ No newline at end of file